@@ -13,6 +13,10 @@ from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, render_template, request, jsonify, session
 
 from engine.state_manager import StateManager
+from engine.turn_queue import TurnQueue, MAX_SUPERSEDE
+from engine.load_governor import GOVERNOR
+from engine.metrics import UPSTREAM, OUTPUT
+from engine.llm_client import LLMCancelled, cancel_scope
 from engine import perception_layer, director_layer, performance_layer, neh_system
 from engine.character import DEFAULT_CHARACTER
 
@@ -61,6 +65,15 @@ app.secret_key = os.urandom(24)
 # 内存中存储所有会话（原型用）
 SESSIONS: dict[str, dict] = {}
 
+PREDICT_EVERY = 5   # NEH Predictor 间隔轮数
+
+# 导演层不可用（异常或 minimal 档位首轮）时的默认输出
+DEFAULT_DIRECTOR = {
+    "narrative_directive": "自然回应用户",
+    "tension_technique": "无",
+    "state_patch": {},
+}
+
 
 def _get_or_create_session(sid: str) -> dict:
     if sid not in SESSIONS:
@@ -70,6 +83,10 @@ def _get_or_create_session(sid: str) -> dict:
             "history": [],
             "turn": 0,
             "debug_history": [],
+            "turn_queue": TurnQueue(),
+            "last_perception": None,    # reduced 档位复用
+            "last_director": None,      # minimal 档位复用
+            "last_predict_turn": -PREDICT_EVERY,
         }
     return SESSIONS[sid]
 
@@ -100,23 +117,85 @@ def chat():
         return jsonify({"error": "消息不能为空"}), 400
 
     sess = SESSIONS[sid]
+    return jsonify(_serve(sid, sess, user_msg))
+
+
+def _serve(sid: str, sess: dict, user_msg: str) -> dict:
+    queue: TurnQueue = sess["turn_queue"]
+    ticket = queue.submit(user_msg)
+    if not ticket.wait():
+        # 本条消息已被其他请求合并进同一轮处理
+        return ticket.result
+
+    # 只有真正在跑管道的 leader 计入排队深度；挂起合并的请求不产生上游调用
+    with GOVERNOR.tracking():
+        return _lead(sid, sess, queue, ticket)
+
+
+def _lead(sid: str, sess: dict, queue: TurnQueue, ticket) -> dict:
+    # 成为本会话的 leader：取走收件箱中所有消息合并为一轮
+    # 档位每批只选一次，被取代重跑时沿用，不重复推进滞回计数
+    profile = GOVERNOR.choose()
+    superseded = 0
+    batch, result = [], None
+    try:
+        while True:
+            batch = queue.take_batch()
+            try:
+                result = _run_turn(sid, sess, [t.message for t in batch], queue, profile,
+                                   force=superseded >= MAX_SUPERSEDE)
+            except Exception as e:
+                log.error("  [轮次] 异常: %s\n%s", e, traceback.format_exc())
+                result = {"error": f"内部错误：{e}"}
+            if result is not None:
+                break
+            superseded += 1
+            queue.requeue(batch)
+            batch = []
+            log.info("  本轮被新消息取代，合并重跑（第 %d 次）| sid=%s", superseded, sid[:8])
+    finally:
+        # 无论如何都要分发结果并交出 leader 身份，否则该会话后续请求会永久挂起
+        if result is None:
+            result = {"error": "内部错误：轮次中断"}
+        # 同批请求拿到同一结果，前端据 batch_id 去重
+        result["batch_id"] = uuid.uuid4().hex
+        queue.finish(batch, result)
+    return ticket.result
+
+
+def _run_turn(sid: str, sess: dict, messages: list, queue: TurnQueue,
+              choice: tuple, force: bool):
+    """
+    执行一轮完整管道。多条消息合并为一次输入。
+    写状态前若被新消息取代（且未强制），返回 None，调用方负责 requeue
+    """
     sm: StateManager = sess["state_manager"]
     state = sm.get_state()
     history = sess["history"]
     turn = sess["turn"]
+    user_msg = "\n".join(messages)
+
+    profile, signals = choice
 
-    log.info("▶ Turn %d | sid=%s | 用户: %s", turn + 1, sid[:8], user_msg[:80])
+    log.info("▶ Turn %d | sid=%s | 档位=%s | 用户(%d条): %s",
+             turn + 1, sid[:8], profile, len(messages), user_msg[:80])
     log.debug("  当前状态: %s", json.dumps(state, ensure_ascii=False))
 
-    debug = {}
+    debug = {"coalesced": len(messages), "profile": {"name": profile, "signals": signals}}
+    # 已达取代上限时本轮不可取消
+    cancel = None if force else queue.cancel
 
     # ── 1. 感知层 + NEH Trigger 并发 ──────────────────────
     def _run_perception():
         try:
             log.debug("  [感知层] 开始分析...")
-            result = perception_layer.analyze(user_msg, state, history)
+            with cancel_scope(cancel):
+                result = perception_layer.analyze(user_msg, state, history)
             log.debug("  [感知层] 结果: %s", json.dumps(result, ensure_ascii=False))
             return result
+        except LLMCancelled:
+            log.debug("  [感知层] 已取消")
+            return {"error": "cancelled", "_module": "perception_layer"}
         except Exception as e:
             log.error("  [感知层] 异常: %s\n%s", e, traceback.format_exc())
             return {"error": str(e), "_module": "perception_layer"}
@@ -124,18 +203,35 @@ def chat():
     def _run_neh_trigger():
         try:
             log.debug("  [NEH Trigger] 开始检查...")
-            result = neh_system.check_trigger(state, turn, {})
+            with cancel_scope(cancel):
+                result = neh_system.check_trigger(state, turn, {})
             log.debug("  [NEH Trigger] 结果: %s", json.dumps(result, ensure_ascii=False))
             return result
+        except LLMCancelled:
+            log.debug("  [NEH Trigger] 已取消")
+            return {"error": "cancelled", "_module": "neh_trigger", "should_trigger": False}
         except Exception as e:
             log.error("  [NEH Trigger] 异常: %s\n%s", e, traceback.format_exc())
             return {"error": str(e), "_module": "neh_trigger", "should_trigger": False}
 
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        f_perception = executor.submit(_run_perception)
-        f_trigger    = executor.submit(_run_neh_trigger)
-        perception  = f_perception.result()
-        neh_trigger = f_trigger.result()
+    if profile == "full":
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            f_perception = executor.submit(_run_perception)
+            f_trigger    = executor.submit(_run_neh_trigger)
+            perception  = f_perception.result()
+            neh_trigger = f_trigger.result()
+        if "error" not in perception:
+            sess["last_perception"] = perception
+    else:
+        # 降级档位：跳过感知层与 Trigger，复用上一轮感知
+        perception = sess["last_perception"] or {"_module": "perception_layer"}
+        neh_trigger = {"_module": "neh_trigger", "should_trigger": False,
+                       "trigger_reason": f"{profile} 档位跳过",
+                       "pending_count": len(state["event_pool"]["pending"])}
+
+    # 提交点：此后开始写状态，不再可被取代
+    if not queue.commit(force):
+        return None
 
     debug["perception"] = perception
     debug["neh_trigger"] = neh_trigger
@@ -149,19 +245,28 @@ def chat():
 
     # ── 2. 导演层（写状态）───────────────────────────────
     state = sm.get_state()
-    log.debug("  [导演层] 开始...")
-    try:
-        director = director_layer.direct(perception, neh_trigger, state, history)
-        log.debug("  [导演层] 结果: %s", json.dumps(director, ensure_ascii=False))
-    except Exception as e:
-        log.error("  [导演层] 异常: %s\n%s", e, traceback.format_exc())
-        director = {"error": str(e), "_module": "director_layer",
-                    "narrative_directive": "自然回应用户",
-                    "tension_technique": "无",
-                    "state_patch": {}}
+    if profile == "minimal":
+        # 沿用上一轮导演指令，不再写状态
+        director = dict(sess["last_director"] or DEFAULT_DIRECTOR,
+                        _module="director_layer", state_patch={}, reused=True)
+    else:
+        log.debug("  [导演层] 开始...")
+        try:
+            # 复用旧感知时，本轮消息只能直接交给导演层
+            director = director_layer.direct(perception, neh_trigger, state, history,
+                                             user_msg=user_msg if profile != "full" else None)
+            log.debug("  [导演层] 结果: %s", json.dumps(director, ensure_ascii=False))
+            if "error" not in director:
+                sess["last_director"] = director
+        except Exception as e:
+            log.error("  [导演层] 异常: %s\n%s", e, traceback.format_exc())
+            director = dict(DEFAULT_DIRECTOR, error=str(e), _module="director_layer")
     debug["director"] = director
 
     patch = director.get("state_patch", {})
+    focus = (director.get("thread_action") or {}).get("focus")
+    if focus:
+        patch = dict(patch, thread_focus=focus)
     if patch:
         log.debug("  [状态] 应用 patch: %s", json.dumps(patch, ensure_ascii=False))
     sm.apply_patch(patch)
@@ -170,7 +275,7 @@ def chat():
     # ── 3. 表现层 ─────────────────────────────────────────
     log.debug("  [表现层] 开始生成...")
     try:
-        performance = performance_layer.generate(director, state, history)
+        performance = performance_layer.generate(director, state, history, user_msg)
         log.debug("  [表现层] 结果: %s", json.dumps(performance, ensure_ascii=False))
     except Exception as e:
         log.error("  [表现层] 异常: %s\n%s", e, traceback.format_exc())
@@ -187,9 +292,13 @@ def chat():
     sess["turn"] += 1
     sess["debug_history"].append({"turn": turn + 1, "debug": debug})
 
-    # ── 4. NEH Predictor 后台执行（每 5 轮）──────────────
+    # ── 4. NEH Predictor 后台执行（每 5 轮，降级时顺延）──
     debug["neh_predict"] = "background"
-    if turn % 5 == 0:
+    predict_due = turn - sess["last_predict_turn"] >= PREDICT_EVERY
+    if predict_due and profile != "full":
+        debug["neh_predict"] = "deferred"
+    elif predict_due:
+        sess["last_predict_turn"] = turn
         history_snap = list(history)
         state_snap   = sm.get_state()
 
@@ -204,12 +313,12 @@ def chat():
 
         threading.Thread(target=_bg_predict, daemon=True).start()
 
-    return jsonify({
+    return {
         "response": response_text,
         "state": sm.get_state(),
         "debug": debug,
         "turn": sess["turn"],
-    })
+    }
 
 
 @app.route("/api/state/<sid>")
@@ -219,6 +328,15 @@ def get_state(sid: str):
     return jsonify(SESSIONS[sid]["state_manager"].get_state())
 
 
+@app.route("/api/metrics")
+def metrics():
+    return jsonify({
+        "load": GOVERNOR.signals(),
+        "upstream": UPSTREAM.snapshot(),
+        "output": OUTPUT.snapshot(),
+    })
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     log.info("启动 Flask，端口 %d", port)
@@ -0,0 +1,114 @@
+"""
+状态压缩 — 长会话下把已关闭/陈旧线程、已触发事件移出热状态
+热状态（state）只保留有界的活跃数据 + 一份有界摘要（digest），
+完整历史进入冷存储（ColdStore），不参与 get_state 深拷贝，也不进入任何 prompt
+"""
+from collections import deque
+
+# 视为"已关闭"的线程状态（导演层输出不统一，中英文都收）
+CLOSED_STATUSES = {"closed", "done", "resolved", "关闭", "已关闭", "完成", "已完成", "结束"}
+
+STALE_TURNS        = 20   # 线程超过多少轮未被推进视为陈旧（同时限定了热状态线程数）
+MAX_HOT_TRIGGERED  = 5    # 热状态中保留的最近已触发事件数
+DIGEST_MAX_LINES   = 8    # 摘要最多保留的行数
+
+
+def is_closed(thread: dict) -> bool:
+    return str(thread.get("status", "")).strip().lower() in CLOSED_STATUSES
+
+
+def is_stale(thread: dict, turn: int) -> bool:
+    return turn - thread.get("last_active_turn", turn) >= STALE_TURNS
+
+
+def summarize_thread(thread: dict) -> str:
+    reason = "关闭" if is_closed(thread) else "搁置"
+    return f"线程「{thread.get('name', thread.get('id', '?'))}」{reason}（{thread.get('progress', 0)}%）"
+
+
+def summarize_event(event: dict) -> str:
+    if "fired_at_turn" in event:
+        return f"第{event['fired_at_turn']}轮 事件「{event.get('name', event.get('id', '?'))}」已发生"
+    return f"事件「{event.get('name', event.get('id', '?'))}」错过时机"
+
+
+def empty_archive() -> dict:
+    """state["archive"] 的初始值"""
+    return {"threads_archived": 0, "events_archived": 0, "digest": []}
+
+
+class ColdStore:
+    """
+    冷存储：归档的线程与事件（完整保留，供调试/持久化）
+    digest 为有界摘要，只保留最近 DIGEST_MAX_LINES 条
+    """
+
+    def __init__(self):
+        self.threads: dict[str, dict] = {}   # id -> 线程，取回时 O(1) 命中
+        self.events: list[dict] = []
+        self._digest: deque[str] = deque(maxlen=DIGEST_MAX_LINES)
+        self._summarized: set[str] = set()   # 已写过摘要的线程 id，反复归档不重复占用摘要行
+
+    def archive_thread(self, thread: dict):
+        self.threads[thread.get("id")] = thread
+        if thread.get("id") not in self._summarized:
+            self._summarized.add(thread.get("id"))
+            self._digest.append(summarize_thread(thread))
+
+    def restore_thread(self, thread_id: str):
+        """取回已归档线程（导演层重新推进它时）；不存在返回 None"""
+        return self.threads.pop(thread_id, None)
+
+    def archive_event(self, event: dict):
+        self.events.append(event)
+        self._digest.append(summarize_event(event))
+
+    def snapshot(self) -> dict:
+        """写回热状态的有界视图"""
+        return {
+            "threads_archived": len(self.threads),
+            "events_archived": len(self.events),
+            "digest": list(self._digest),
+        }
+
+
+def compact(state: dict, cold: ColdStore, thread_index: dict) -> bool:
+    """
+    就地压缩 state，归档内容写入 cold，并同步维护 thread_index
+    返回是否有内容被归档
+    """
+    turn = state["meta"]["turn"]
+    archived = False
+
+    # ── 线程：关闭/陈旧的移出 ─────────────────────────
+    hot = []
+    for t in state["threads"]:
+        if is_closed(t) or is_stale(t, turn):
+            cold.archive_thread(t)
+            thread_index.pop(t.get("id"), None)
+            archived = True
+        else:
+            hot.append(t)
+    state["threads"] = hot
+
+    # ── 事件：已触发的只留最近几条；已过最晚轮次的待发事件作废 ──
+    pool = state["event_pool"]
+    triggered = pool["triggered"]
+    if len(triggered) > MAX_HOT_TRIGGERED:
+        for ev in triggered[:-MAX_HOT_TRIGGERED]:
+            cold.archive_event(ev)
+        pool["triggered"] = triggered[-MAX_HOT_TRIGGERED:]
+        archived = True
+
+    pending = []
+    for ev in pool["pending"]:
+        if isinstance(ev.get("trigger_turn_max"), int) and ev["trigger_turn_max"] < turn:
+            cold.archive_event(ev)
+            archived = True
+        else:
+            pending.append(ev)
+    pool["pending"] = pending
+
+    if archived:
+        state["archive"] = cold.snapshot()
+    return archived
@@ -1,8 +1,10 @@
 """
 导演层 — 唯一有状态写权限的模块，输出叙事指令 + state_patch
 """
-from .llm_client import call_llm_json
+from .llm_client import call_llm_structured
 from .character import DEFAULT_CHARACTER
+from .schema import compile_schema
+from .momentum import describe as describe_momentum
 
 SYSTEM = """你是叙事引擎的【导演层】核心决策模块。
 你掌握完整的叙事状态，负责制定本轮的叙事战略。
@@ -22,38 +24,111 @@ SYSTEM = """你是叙事引擎的【导演层】核心决策模块。
       "emotion": {"label": "新情绪", "intensity": 数字} 或null,
       "energy": 数字或null
     },
-    "momentum": {
-      "pace": "slow/medium/fast 或null",
-      "direction": "escalating/stable/de-escalating 或null"
-    },
-    "threads_add": [],
-    "threads_update": [],
+    "threads_add": [{"id": "线程ID", "name": "线程名", "status": "active", "progress": 0}],
+    "threads_update": [{"id": "已有线程ID", "status": "active/paused/closed", "progress": 数字}],
     "patch_summary": "本轮状态变化摘要（20字以内）"
   },
   "neh_trigger_recommendation": "触发/等待",
   "director_note": "导演内心独白（调试用，不给用户看）"
 }
 
-注意：state_patch.axes 中 null 表示该字段不变。"""
+注意：state_patch.axes 中 null 表示该字段不变；动量由引擎根据轴值变化自动计算，无需输出。"""
+
+_AXIS = {"type": ["integer", "null"], "minimum": 0, "maximum": 100}
+
+SCHEMA = compile_schema("director_decision", "提交本轮导演决策与 state_patch", {
+    "type": "object",
+    "properties": {
+        "narrative_directive": {"type": "string"},
+        "tension_technique":   {"type": "string", "default": "自然流"},
+        "thread_action": {
+            "type": "object",
+            "properties": {
+                "focus":  {"type": "string"},
+                "action": {"type": "string", "enum": ["推进", "暂停", "引入", "关闭"]},
+            },
+            "required": ["focus", "action"],
+        },
+        "state_patch": {
+            "type": "object",
+            "properties": {
+                "axes": {
+                    "type": "object",
+                    "properties": {
+                        "tension":  _AXIS,
+                        "intimacy": _AXIS,
+                        "energy":   _AXIS,
+                        "emotion": {
+                            "type": ["object", "null"],
+                            "properties": {
+                                "label":     {"type": "string"},
+                                "intensity": {"type": "integer", "minimum": 0, "maximum": 100},
+                            },
+                            "required": ["label", "intensity"],
+                        },
+                    },
+                },
+                "threads_add": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id":       {"type": "string"},
+                            "name":     {"type": "string"},
+                            "status":   {"type": "string"},
+                            "progress": {"type": "integer", "minimum": 0, "maximum": 100},
+                        },
+                        "required": ["id", "name"],
+                    },
+                },
+                "threads_update": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id":       {"type": "string"},
+                            "status":   {"type": "string"},
+                            "progress": {"type": "integer", "minimum": 0, "maximum": 100},
+                        },
+                        "required": ["id"],
+                    },
+                },
+                "patch_summary": {"type": "string"},
+            },
+            "default": {},
+        },
+        "neh_trigger_recommendation": {"type": "string", "enum": ["触发", "等待"]},
+        "director_note": {"type": "string"},
+    },
+    "required": ["narrative_directive", "tension_technique", "state_patch"],
+})
 
 
-def direct(perception: dict, neh_output: dict, state: dict, history: list) -> dict:
+def direct(perception: dict, neh_output: dict, state: dict, history: list,
+           user_msg: str | None = None) -> dict:
     axes = state["axes"]
     threads_text = "\n".join(
-        f"  - [{t['status']}] {t['name']} ({t.get('progress', 0)}%)"
+        f"  - [{t.get('status', 'active')}] {t['id']} {t.get('name', '')} ({t.get('progress', 0)}%)"
         for t in state["threads"]
     ) or "  （无活跃线程）"
 
+    archive = state.get("archive", {})
+    archive_text = "\n".join(f"  - {line}" for line in archive.get("digest", [])) or "  （无）"
+
     neh_text = ""
     if neh_output.get("should_trigger"):
         neh_text = f"⚡ NEH 建议触发事件：{neh_output.get('event_name', '未知')}"
     else:
         neh_text = f"NEH 待触发事件数：{neh_output.get('pending_count', 0)}"
 
+    reused_text = ""
+    if user_msg:
+        reused_text = f"\n【用户本轮消息】（以下感知报告沿用上一轮，请以本条消息为准）\n\"{user_msg}\"\n"
+
     user_prompt = f"""
 【角色】{DEFAULT_CHARACTER['name']}
 {DEFAULT_CHARACTER['persona']}
-
+{reused_text}
 【感知层报告】
 - 用户意图：{perception.get('user_intent')}
 - 情绪：{perception.get('emotional_tone')}  参与度：{perception.get('engagement_level')}
@@ -64,11 +139,14 @@ def direct(perception: dict, neh_output: dict, state: dict, history: list) -> di
 【当前六轴状态】
 - 张力：{axes['tension']}  亲密度：{axes['intimacy']}
 - 情绪：{axes['emotion']}  驱动：{axes['drive']}  能量：{axes['energy']}
-- 动量：{state['momentum']}
+- 动量：{describe_momentum(state['momentum'], detailed=True)}
 
 【活跃线程】
 {threads_text}
 
+【已归档的叙事（摘要）】
+{archive_text}
+
 【NEH 系统】
 {neh_text}
 
@@ -76,7 +154,7 @@ def direct(perception: dict, neh_output: dict, state: dict, history: list) -> di
 
 请制定本轮叙事战略，输出导演决策 JSON。"""
 
-    result = call_llm_json(SYSTEM, user_prompt)
+    result = call_llm_structured(SYSTEM, user_prompt, SCHEMA)
     result["_module"] = "director_layer"
 
     # 清理 null 值，避免 apply_patch 错误覆盖
@@ -84,9 +162,5 @@ def direct(perception: dict, neh_output: dict, state: dict, history: list) -> di
         result["state_patch"]["axes"] = {
             k: v for k, v in result["state_patch"]["axes"].items() if v is not None
         }
-    if "state_patch" in result and "momentum" in result["state_patch"]:
-        result["state_patch"]["momentum"] = {
-            k: v for k, v in result["state_patch"]["momentum"].items() if v is not None
-        }
 
     return result
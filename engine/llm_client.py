@@ -1,20 +1,42 @@
 """
 统一 LLM 调用客户端
 使用 Anthropic SDK 调用 MiniMax Anthropic 兼容接口
+结构化输出走 tool_use：schema 作为工具入参约束，本地校验，只修复失效字段
 """
 import os
 import json
 import time
 import logging
+import threading
+from contextlib import contextmanager
 import anthropic
 
+from .metrics import UPSTREAM, OUTPUT
+from .schema import CompiledSchema, prune
+
 MINIMAX_BASE_URL = "https://api.minimaxi.com/anthropic"
 DEFAULT_MODEL = "MiniMax-M2.5"
 
 _client = None
+_local = threading.local()
 log = logging.getLogger("narrative_engine.llm_client")
 
 
+class LLMCancelled(Exception):
+    """当前线程的取消令牌已置位，上游调用被提前中止"""
+
+
+@contextmanager
+def cancel_scope(token: threading.Event | None):
+    """在当前线程内绑定取消令牌；令牌置位后，进行中的调用在下一个流事件处中止"""
+    prev = getattr(_local, "cancel", None)
+    _local.cancel = token
+    try:
+        yield
+    finally:
+        _local.cancel = prev
+
+
 def _load_env():
     """从 .env 文件加载环境变量（如果存在）"""
     env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
@@ -48,8 +70,8 @@ def _get_client() -> anthropic.Anthropic:
     return _client
 
 
-def call_llm(system_prompt: str, user_prompt: str, model: str = DEFAULT_MODEL) -> str:
-    """普通文本调用，返回字符串"""
+def _request(system_prompt: str, user_prompt: str, model: str, **extra):
+    """发起一次调用，返回 Message；负责取消令牌与上游指标"""
     # 非 MiniMax 模型自动回退，避免路由到错误端点
     if not model.startswith("MiniMax"):
         log.warning("模型 %s 不适用于 MiniMax 端点，自动替换为 %s", model, DEFAULT_MODEL)
@@ -63,29 +85,50 @@ def call_llm(system_prompt: str, user_prompt: str, model: str = DEFAULT_MODEL) -
     log.debug("  system_prompt (%d chars): %s", len(system_prompt), system_prompt[:200])
     log.debug("  user_prompt (%d chars): %s", len(user_prompt), user_prompt[:200])
 
+    token = getattr(_local, "cancel", None)
+    if token is not None and token.is_set():
+        raise LLMCancelled("调用前已取消")
+
     t0 = time.time()
-    message = client.messages.create(
+    kwargs = dict(
         model=model,
         max_tokens=1024,
         system=system_prompt,
         messages=[{"role": "user", "content": user_prompt}],
+        **extra,
     )
+    try:
+        if token is None:
+            message = client.messages.create(**kwargs)
+        else:
+            # 可取消调用走流式，令牌置位即关闭连接，释放上游
+            with client.messages.stream(**kwargs) as stream:
+                for _ in stream:
+                    if token.is_set():
+                        log.debug("  已取消，中止流 (%.2fs)", time.time() - t0)
+                        raise LLMCancelled("调用中被取消")
+                message = stream.get_final_message()
+    except LLMCancelled:
+        raise
+    except Exception:
+        UPSTREAM.record_call(time.time() - t0, ok=False)
+        raise
     elapsed = time.time() - t0
+    UPSTREAM.record_call(elapsed)
+    log.debug("── LLM 完成 (%.2fs) ─────────────────────", elapsed)
+    return message
+
 
+def call_llm(system_prompt: str, user_prompt: str, model: str = DEFAULT_MODEL) -> str:
+    """普通文本调用，返回字符串"""
+    message = _request(system_prompt, user_prompt, model)
     content = message.content[0].text
-    log.debug("  耗时: %.2fs", elapsed)
     log.debug("  回复 (%d chars): %s", len(content), content[:300])
-    log.debug("── LLM 完成 (%.2fs) ─────────────────────", elapsed)
     return content
 
 
-def call_llm_json(system_prompt: str, user_prompt: str, model: str = DEFAULT_MODEL) -> dict:
-    """返回 JSON dict，自动解析"""
-    system_prompt = (
-        system_prompt
-        + "\n\n【重要】你的输出必须是合法的 JSON，不加任何 markdown 代码块，不加任何额外解释。"
-    )
-    raw = call_llm(system_prompt, user_prompt, model)
+def _parse_json(raw: str):
+    """解析模型文本中的 JSON；失败返回 None"""
     raw = raw.strip()
 
     # 去掉可能的 ```json ... ``` 包裹
@@ -97,7 +140,7 @@ def call_llm_json(system_prompt: str, user_prompt: str, model: str = DEFAULT_MOD
     try:
         result = json.loads(raw)
         log.debug(
-            "call_llm_json 解析成功，keys: %s",
+            "JSON 解析成功，keys: %s",
             list(result.keys()) if isinstance(result, dict) else type(result),
         )
         return result
@@ -113,4 +156,127 @@ def call_llm_json(system_prompt: str, user_prompt: str, model: str = DEFAULT_MOD
             except Exception:
                 pass
         log.error("JSON 完全解析失败，原文: %s", raw)
+        return None
+
+
+def call_llm_json(system_prompt: str, user_prompt: str, model: str = DEFAULT_MODEL) -> dict:
+    """返回 JSON dict，自动解析（无 schema 的自由格式调用）"""
+    system_prompt = (
+        system_prompt
+        + "\n\n【重要】你的输出必须是合法的 JSON，不加任何 markdown 代码块，不加任何额外解释。"
+    )
+    raw = call_llm(system_prompt, user_prompt, model)
+    OUTPUT.incr("raw_json", "calls")
+    result = _parse_json(raw)
+    if result is None:
+        OUTPUT.incr("raw_json", "parse_failures")
         return {"error": "JSON parse failed", "raw": raw}
+    return result
+
+
+def _call_tool(system_prompt: str, user_prompt: str, schema: CompiledSchema, model: str):
+    """强制调用 schema 对应的工具，返回工具入参 dict；取不到时返回 None"""
+    message = _request(
+        system_prompt + f"\n\n【重要】通过调用工具 {schema.name} 提交结果，不要输出其他内容。",
+        user_prompt,
+        model,
+        tools=[schema.tool],
+        tool_choice={"type": "tool", "name": schema.name},
+    )
+    for block in message.content:
+        if block.type == "tool_use":
+            log.debug("  工具入参: %s", json.dumps(block.input, ensure_ascii=False)[:300])
+            return block.input if isinstance(block.input, dict) else None
+
+    # 兼容端点忽略 tools 的情况：回退解析文本
+    text = "".join(b.text for b in message.content if b.type == "text")
+    log.warning("未返回 tool_use（stop_reason=%s），回退解析文本", message.stop_reason)
+    result = _parse_json(text)
+    return result if isinstance(result, dict) else None
+
+
+def _settle(schema: CompiledSchema, value: dict) -> tuple[dict, list]:
+    """
+    本地纠正 + 校验 + 裁剪可选的失效字段 + 有默认值的顶层字段直接回填，
+    返回 (结果, 只能重新生成的错误)
+    """
+    value = schema.coerce(value)
+    errors = schema.validate(value)
+    if not errors:
+        return value, []
+    OUTPUT.incr(schema.name, "invalid_fields", len(errors))
+
+    prunable, broken = [], []
+    for path, msg in errors:
+        point = schema.prune_point(path)
+        if point is None:
+            broken.append((path, msg))
+        else:
+            prunable.append(point)
+    if prunable:
+        prune(value, prunable)
+        OUTPUT.incr(schema.name, "pruned_fields", len(set(prunable)))
+        log.debug("  [%s] 裁剪失效字段: %s", schema.name, prunable)
+
+    defaulted = sorted({path[0] for path, _ in broken if path and schema.has_default(path[0])})
+    if defaulted:
+        for f in defaulted:
+            value[f] = schema.default(f)
+        OUTPUT.incr(schema.name, "defaulted_fields", len(defaulted))
+        log.debug("  [%s] 失效字段回填默认值: %s", schema.name, defaulted)
+        broken = [(path, msg) for path, msg in broken if not path or path[0] not in defaulted]
+    return value, broken
+
+
+def call_llm_structured(system_prompt: str, user_prompt: str, schema: CompiledSchema,
+                        model: str = DEFAULT_MODEL) -> dict:
+    """
+    结构化调用：tool_use 输出 → 本地按 schema 校验纠正 →
+    有默认值的字段本地回填，仅对无默认值的必填顶层字段发起一次补全调用；仍失败则删除该字段
+    """
+    OUTPUT.incr(schema.name, "calls")
+    result = _call_tool(system_prompt, user_prompt, schema, model)
+    if result is None:
+        OUTPUT.incr(schema.name, "parse_failures")
+        result = {}
+
+    result, broken = _settle(schema, result)
+    if not broken:
+        return result
+
+    fields = sorted({path[0] for path, _ in broken if path})
+    hint = "\n".join(f"- {'.'.join(map(str, path))}：{msg}" for path, msg in broken)
+    log.warning("  [%s] 字段失效，局部补全: %s", schema.name, fields)
+    OUTPUT.incr(schema.name, "repairs")
+
+    sub = schema.subset(fields)
+    try:
+        fixed = _call_tool(
+            system_prompt,
+            user_prompt + f"\n\n【补全】上次输出中以下字段缺失或不合法，只需重新给出这些字段：\n{hint}",
+            sub,
+            model,
+        )
+        if fixed is None:
+            OUTPUT.incr(schema.name, "parse_failures")
+            fixed = {}
+    except LLMCancelled:
+        raise
+    except Exception as e:
+        # 补全调用失败不应丢掉首次调用的有效结果，按未补全处理
+        log.error("  [%s] 补全调用异常: %s", schema.name, e)
+        fixed = {}
+    fixed, still_broken = _settle(sub, fixed)
+    failed = {path[0] for path, _ in still_broken if path}
+
+    for f in fields:
+        if f in fixed and f not in failed:
+            result[f] = fixed[f]
+        else:
+            result.pop(f, None)
+    unresolved = [f for f in fields if f in failed or f not in fixed]
+    if unresolved:
+        OUTPUT.incr(schema.name, "repair_failures")
+        result["_invalid"] = unresolved
+        log.error("  [%s] 补全后仍失效: %s", schema.name, unresolved)
+    return result
@@ -0,0 +1,84 @@
+"""
+负载自适应调度 — 每轮根据实时负载选择管道档位
+  full     感知 ∥ Trigger → 导演 → 表现
+  reduced  跳过 Trigger，复用上一轮感知 → 导演 → 表现
+  minimal  仅表现层，沿用上一轮导演指令
+负载分 = max(执行中轮次数, 上游延迟, 错误率) 各自除以高水位；
+升档（变重）立即生效，降档每次只退一级，且需低于退出阈值并保持 HOLD_TURNS 轮，避免抖动
+"""
+import threading
+from contextlib import contextmanager
+
+from .metrics import UPSTREAM
+
+PROFILES = ["full", "reduced", "minimal"]
+
+DEPTH_HIGH   = 8      # 全局正在执行的轮次数高水位
+LATENCY_HIGH = 8.0    # 上游延迟 EWMA 高水位（秒）
+ERROR_HIGH   = 0.3    # 上游错误率 EWMA 高水位
+
+# 进入阈值 / 退出阈值（退出低于进入，形成滞回区间）
+ENTER = {"reduced": 1.0, "minimal": 1.5}
+EXIT  = {"reduced": 0.7, "minimal": 1.1}
+HOLD_TURNS = 3
+
+
+class LoadGovernor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._level = 0          # PROFILES 下标
+        self._calm_turns = 0     # 连续低于退出阈值的轮数
+
+    @contextmanager
+    def tracking(self):
+        """包住一次正在执行的轮次（leader），计入排队深度"""
+        with self._lock:
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def signals(self) -> dict:
+        up = UPSTREAM.snapshot()
+        with self._lock:
+            depth = self._inflight
+        score = max(
+            depth / DEPTH_HIGH,
+            up["latency_ewma"] / LATENCY_HIGH,
+            up["error_rate"] / ERROR_HIGH,
+        )
+        return {
+            "queue_depth": depth,
+            "latency_ewma": up["latency_ewma"],
+            "error_rate": up["error_rate"],
+            "load_score": round(score, 3),
+        }
+
+    def choose(self) -> tuple[str, dict]:
+        """选择本轮档位，返回 (档位名, 负载信号)"""
+        sig = self.signals()
+        score = sig["load_score"]
+        with self._lock:
+            target = 0
+            for level in range(len(PROFILES) - 1, 0, -1):
+                if score >= ENTER[PROFILES[level]]:
+                    target = level
+                    break
+
+            if target > self._level:
+                self._level = target
+                self._calm_turns = 0
+            elif self._level > 0 and score < EXIT[PROFILES[self._level]]:
+                self._calm_turns += 1
+                if self._calm_turns >= HOLD_TURNS:
+                    self._level -= 1
+                    self._calm_turns = 0
+            else:
+                self._calm_turns = 0
+            return PROFILES[self._level], sig
+
+
+GOVERNOR = LoadGovernor()
@@ -0,0 +1,68 @@
+"""
+上游调用指标 — 进程级，线程安全
+llm_client 每次调用写入；负载调度（load_governor）与 /api/metrics 读取
+"""
+import threading
+
+EWMA_ALPHA = 0.2   # 指数滑动平均系数，越大越敏感
+
+
+class UpstreamMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.latency_ewma = 0.0   # 秒
+        self.error_ewma = 0.0     # 0-1
+
+    def record_call(self, elapsed: float, ok: bool = True):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            if self.calls == 1:
+                self.latency_ewma = elapsed
+                self.error_ewma = 0.0 if ok else 1.0
+                return
+            self.latency_ewma += EWMA_ALPHA * (elapsed - self.latency_ewma)
+            self.error_ewma += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_ewma)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "latency_ewma": round(self.latency_ewma, 3),
+                "error_rate": round(self.error_ewma, 3),
+            }
+
+
+UPSTREAM = UpstreamMetrics()
+
+
+class OutputMetrics:
+    """结构化输出质量：按 schema 统计解析失败、字段校验失败与局部修复"""
+
+    FIELDS = ("calls", "parse_failures", "invalid_fields", "pruned_fields",
+              "defaulted_fields", "repairs", "repair_failures")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_name: dict[str, dict] = {}
+
+    def incr(self, name: str, field: str, n: int = 1):
+        with self._lock:
+            stats = self._by_name.setdefault(name, dict.fromkeys(self.FIELDS, 0))
+            stats[field] += n
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = {}
+            for name, stats in self._by_name.items():
+                # 补全调用同样可能解析失败，计入分母
+                calls = (stats["calls"] + stats["repairs"]) or 1
+                out[name] = dict(stats, parse_failure_rate=round(stats["parse_failures"] / calls, 3))
+            return out
+
+
+OUTPUT = OutputMetrics()
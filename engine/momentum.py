@@ -0,0 +1,116 @@
+"""
+动量引擎 — 本地计算叙事动量，不再交给导演层 LLM
+每次 apply_patch 后记录一帧轴值（定长数组窗口），据此计算：
+  pace / direction / streak       写入 state.momentum
+  平滑值 / 趋势 / 波动率（每轴）   写入 state.momentum.features，供导演层参考
+"""
+from array import array
+
+AXES = ("tension", "intimacy", "energy", "emotion_intensity")
+# 参与"叙事烈度"合成的轴（亲密度是关系量，不计入节奏）
+INTENSITY_AXES = ("tension", "energy", "emotion_intensity")
+
+WINDOW     = 32     # 每轴保留的最近帧数
+EWMA_ALPHA = 0.4    # 平滑系数
+TREND_SPAN = 3      # 趋势 = 平滑值在最近 N 帧内的平均变化
+DIR_EPS    = 1.5    # 单帧变化超过该值才算有方向
+PACE_SLOW  = 3.0    # 近期平均绝对变化 < 此值为 slow
+PACE_FAST  = 8.0    # ≥ 此值为 fast
+
+
+def _num(v, default: float) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return default
+
+
+def _direction(delta: float) -> str:
+    if delta > DIR_EPS:
+        return "escalating"
+    if delta < -DIR_EPS:
+        return "de-escalating"
+    return "stable"
+
+
+class AxisSeries:
+    """每个会话一份；各轴一条定长 array('d') 序列"""
+
+    def __init__(self):
+        self._series = {k: array("d") for k in AXES}
+        self._smooth = {k: array("d") for k in AXES}
+
+    def __len__(self) -> int:
+        return len(self._series["tension"])
+
+    def record(self, axes: dict):
+        # emotion 可能被 patch 覆盖成非 dict（如纯字符串），此时取默认强度
+        emotion = axes.get("emotion")
+        frame = {
+            "tension":   _num(axes.get("tension"), 50),
+            "intimacy":  _num(axes.get("intimacy"), 20),
+            "energy":    _num(axes.get("energy"), 60),
+            "emotion_intensity": _num(emotion.get("intensity") if isinstance(emotion, dict) else None, 40),
+        }
+        for k, v in frame.items():
+            raw, smooth = self._series[k], self._smooth[k]
+            smooth.append(v if not smooth else smooth[-1] + EWMA_ALPHA * (v - smooth[-1]))
+            raw.append(v)
+            if len(raw) > WINDOW:
+                del raw[0]
+                del smooth[0]
+
+    def _intensity(self) -> list[float]:
+        cols = [self._series[k] for k in INTENSITY_AXES]
+        return [sum(vals) / len(vals) for vals in zip(*cols)]
+
+    def features(self) -> dict:
+        out = {}
+        for k in AXES:
+            raw, smooth = self._series[k], self._smooth[k]
+            if not raw:
+                continue
+            span = min(TREND_SPAN, len(smooth) - 1)
+            trend = (smooth[-1] - smooth[-1 - span]) / span if span else 0.0
+            deltas = [b - a for a, b in zip(raw, raw[1:])]
+            if deltas:
+                mean = sum(deltas) / len(deltas)
+                vol = (sum((d - mean) ** 2 for d in deltas) / len(deltas)) ** 0.5
+            else:
+                vol = 0.0
+            out[k] = {"value": raw[-1], "smoothed": round(smooth[-1], 1),
+                      "trend": round(trend, 2), "volatility": round(vol, 2)}
+        return out
+
+    def momentum(self) -> dict:
+        """由合成烈度序列计算 pace / direction / streak"""
+        series = self._intensity()
+        deltas = [b - a for a, b in zip(series, series[1:])]
+        if not deltas:
+            return {"pace": "medium", "direction": "stable", "streak": 0}
+
+        recent = deltas[-TREND_SPAN:]
+        mean_abs = sum(abs(d) for d in recent) / len(recent)
+        pace = "slow" if mean_abs < PACE_SLOW else "fast" if mean_abs >= PACE_FAST else "medium"
+
+        dirs = [_direction(d) for d in deltas]
+        streak = 0
+        for d in reversed(dirs):
+            if d != dirs[-1]:
+                break
+            streak += 1
+        return {"pace": pace, "direction": dirs[-1], "streak": streak}
+
+
+AXIS_LABELS = {"tension": "张力", "intimacy": "亲密度", "energy": "能量", "emotion_intensity": "情绪强度"}
+
+
+def describe(momentum: dict, detailed: bool = False) -> str:
+    """渲染给 prompt 的动量文本；detailed 时附带每轴趋势与波动率"""
+    text = f"{momentum['pace']} / {momentum['direction']} / 连续{momentum['streak']}轮"
+    if not detailed:
+        return text
+    lines = [text]
+    for k, f in momentum.get("features", {}).items():
+        lines.append(f"  · {AXIS_LABELS[k]}：平滑{f['smoothed']}  趋势{f['trend']:+}/轮  波动{f['volatility']}")
+    return "\n".join(lines)
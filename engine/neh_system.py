@@ -2,8 +2,9 @@
 NEH 子系统：Predictor（预测） + EventPool（存储） + Trigger（触发判定）
 宏观叙事事件，每 5 轮预测一次，每轮检查触发条件
 """
-from .llm_client import call_llm_json
+from .llm_client import call_llm_structured
 from .character import DEFAULT_CHARACTER
+from .schema import compile_schema
 
 # ─── Predictor ────────────────────────────────────────────────────────────────
 
@@ -27,6 +28,32 @@ PREDICT_SYSTEM = """你是叙事引擎的【NEH Predictor】模块。
   ]
 }"""
 
+PREDICT_SCHEMA = compile_schema("neh_predictions", "提交预测的宏观叙事事件卡", {
+    "type": "object",
+    "properties": {
+        "events": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id":                {"type": "string"},
+                    "name":              {"type": "string"},
+                    "description":       {"type": "string"},
+                    "trigger_condition": {"type": "string"},
+                    "trigger_turn_min":  {"type": "integer", "minimum": 0},
+                    "trigger_turn_max":  {"type": "integer", "minimum": 0},
+                    "required_axes":     {"type": "object"},
+                    "priority":          {"type": "integer", "minimum": 1, "maximum": 5},
+                    "narrative_impact":  {"type": "string"},
+                },
+                "required": ["id", "name", "trigger_condition", "trigger_turn_min", "trigger_turn_max"],
+            },
+            "default": [],
+        },
+    },
+    "required": ["events"],
+})
+
 
 def predict(state: dict, history: list) -> list:
     axes = state["axes"]
@@ -51,7 +78,7 @@ def predict(state: dict, history: list) -> list:
 
 请预测 3-4 个宏观叙事事件，事件应该具有戏剧性和不可逆性。"""
 
-    result = call_llm_json(PREDICT_SYSTEM, user_prompt)
+    result = call_llm_structured(PREDICT_SYSTEM, user_prompt, PREDICT_SCHEMA)
     return result.get("events", [])
 
 
@@ -69,6 +96,18 @@ TRIGGER_SYSTEM = """你是叙事引擎的【NEH Trigger】模块。
   "pending_count": 待触发事件数量
 }"""
 
+TRIGGER_SCHEMA = compile_schema("neh_trigger_decision", "提交本轮事件触发判定", {
+    "type": "object",
+    "properties": {
+        "should_trigger": {"type": "boolean", "default": False},
+        "event_id":       {"type": ["string", "null"]},
+        "event_name":     {"type": ["string", "null"]},
+        "trigger_reason": {"type": "string"},
+        "pending_count":  {"type": "integer", "minimum": 0},
+    },
+    "required": ["should_trigger"],
+})
+
 
 def check_trigger(state: dict, turn: int, perception: dict) -> dict:
     pending = state["event_pool"]["pending"]
@@ -101,7 +140,7 @@ def check_trigger(state: dict, turn: int, perception: dict) -> dict:
 
 判断：现在是否是触发某事件的最佳时机？"""
 
-    result = call_llm_json(TRIGGER_SYSTEM, user_prompt)
+    result = call_llm_structured(TRIGGER_SYSTEM, user_prompt, TRIGGER_SCHEMA)
     result["_module"] = "neh_trigger"
     result["pending_count"] = len(pending)
     return result
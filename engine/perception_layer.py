@@ -2,8 +2,10 @@
 感知层 — 只读，分析用户输入并输出结构化感知报告
 """
 import json
-from .llm_client import call_llm_json
+from .llm_client import call_llm_structured
 from .character import DEFAULT_CHARACTER
+from .schema import compile_schema
+from .momentum import describe as describe_momentum
 
 SYSTEM = """你是叙事引擎的【感知层】分析模块。
 你的任务：分析用户最新消息，输出结构化感知报告。
@@ -15,10 +17,25 @@ SYSTEM = """你是叙事引擎的【感知层】分析模块。
   "engagement_level": 0-100之间的整数,
   "key_signals": ["关键叙事信号1", "关键叙事信号2"],
   "narrative_opportunity": "本轮最佳叙事切入点（一句话）",
-  "tension_hint": "应该升高/维持/降低张力",
+  "tension_hint": "升高/维持/降低（张力走向建议）",
   "follow_type": "主动引导型/被动跟随型/探索型/挑战型"
 }"""
 
+SCHEMA = compile_schema("perception_report", "提交本轮感知分析报告", {
+    "type": "object",
+    "properties": {
+        "user_intent":           {"type": "string"},
+        "emotional_tone":        {"type": "string"},
+        "engagement_level":      {"type": "integer", "minimum": 0, "maximum": 100, "default": 50},
+        "key_signals":           {"type": "array", "items": {"type": "string"}, "default": []},
+        "narrative_opportunity": {"type": "string", "default": ""},
+        "tension_hint":          {"type": "string", "enum": ["升高", "维持", "降低"], "default": "维持"},
+        "follow_type":           {"type": "string", "enum": ["主动引导型", "被动跟随型", "探索型", "挑战型"]},
+    },
+    "required": ["user_intent", "emotional_tone", "engagement_level",
+                 "narrative_opportunity", "tension_hint"],
+})
+
 
 def analyze(user_message: str, state: dict, history: list) -> dict:
     history_text = ""
@@ -33,7 +50,7 @@ def analyze(user_message: str, state: dict, history: list) -> dict:
 
 【当前状态快照】
 - 张力：{axes['tension']}  亲密度：{axes['intimacy']}  情绪：{axes['emotion']}
-- 叙事动量：{state['momentum']}
+- 叙事动量：{describe_momentum(state['momentum'])}
 - 活跃线程数：{len(state['threads'])}
 
 【用户最新消息】
@@ -41,6 +58,6 @@ def analyze(user_message: str, state: dict, history: list) -> dict:
 
 请输出感知分析 JSON。"""
 
-    result = call_llm_json(SYSTEM, user_prompt)
+    result = call_llm_structured(SYSTEM, user_prompt, SCHEMA)
     result["_module"] = "perception_layer"
     return result
@@ -28,7 +28,7 @@ SYSTEM_TPL = """你是 {name}。
 - 用空行分段制造停顿感"""
 
 
-def generate(director_output: dict, state: dict, history: list) -> dict:
+def generate(director_output: dict, state: dict, history: list, user_msg: str = "") -> dict:
     directive = director_output.get("narrative_directive", "自然推进对话")
     technique = director_output.get("tension_technique", "自然流")
     axes = state["axes"]
@@ -48,6 +48,9 @@ def generate(director_output: dict, state: dict, history: list) -> dict:
     for h in history[-8:]:
         role = "用户" if h["role"] == "user" else DEFAULT_CHARACTER["name"]
         history_text += f"{role}：{h['content']}\n"
+    if user_msg:
+        # 本轮消息在生成后才写入 history，这里显式补上
+        history_text += f"用户：{user_msg}\n"
 
     user_prompt = f"""【近期对话记录】
 {history_text if history_text else "（对话开始）"}
@@ -0,0 +1,158 @@
+"""
+结构化输出 Schema — 编译一次，本地校验 / 纠正 / 裁剪
+只支持本项目用到的 JSON Schema 子集：
+  type（可为列表）、properties、required、items、enum、minimum、maximum、default
+编译后的 schema 同时作为 tool 的 input_schema 发给模型
+"""
+import copy
+
+
+_TYPE_CHECKS = {
+    "object":  lambda v: isinstance(v, dict),
+    "array":   lambda v: isinstance(v, list),
+    "string":  lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number":  lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null":    lambda v: v is None,
+}
+
+
+class _Node:
+    def __init__(self, schema: dict):
+        t = schema.get("type", [])
+        self.types = [t] if isinstance(t, str) else list(t)
+        self.enum = schema.get("enum")
+        self.minimum = schema.get("minimum")
+        self.maximum = schema.get("maximum")
+        self.required = set(schema.get("required", []))
+        self.props = {k: _Node(v) for k, v in schema.get("properties", {}).items()}
+        self.items = _Node(schema["items"]) if "items" in schema else None
+
+    def type_ok(self, v) -> bool:
+        return not self.types or any(_TYPE_CHECKS[t](v) for t in self.types)
+
+    def coerce(self, v):
+        """本地纠正常见的小偏差：数字字符串、越界数值、枚举大小写、单值代替数组等"""
+        if v is None:
+            return v
+        if isinstance(v, dict) and "object" in self.types:
+            return {k: self.props[k].coerce(x) if k in self.props else x for k, x in v.items()}
+        if "array" in self.types and self.items is not None:
+            if isinstance(v, list):
+                return [self.items.coerce(x) for x in v]
+            if "string" not in self.types:
+                return [self.items.coerce(v)]
+        if ("integer" in self.types or "number" in self.types) and not isinstance(v, bool):
+            num = v
+            if isinstance(v, str):
+                try:
+                    num = float(v.strip().rstrip("%"))
+                except ValueError:
+                    num = v
+            if isinstance(num, (int, float)):
+                if "integer" in self.types:
+                    num = int(round(num))
+                if self.minimum is not None:
+                    num = max(num, self.minimum)
+                if self.maximum is not None:
+                    num = min(num, self.maximum)
+                return num
+        if "boolean" in self.types and isinstance(v, str):
+            low = v.strip().lower()
+            if low in ("true", "false"):
+                return low == "true"
+        if "string" in self.types and isinstance(v, (int, float)) and not isinstance(v, bool):
+            v = str(v)
+        if self.enum and isinstance(v, str) and v not in self.enum:
+            for e in self.enum:
+                if isinstance(e, str) and e.lower() == v.strip().lower():
+                    return e
+        return v
+
+    def validate(self, v, path: tuple, errors: list):
+        if not self.type_ok(v):
+            errors.append((path, f"类型应为 {'/'.join(self.types)}"))
+            return
+        if v is None:
+            return
+        if self.enum is not None and v not in self.enum:
+            errors.append((path, f"取值应为 {self.enum}"))
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            if self.minimum is not None and v < self.minimum or self.maximum is not None and v > self.maximum:
+                errors.append((path, f"超出范围 {self.minimum}-{self.maximum}"))
+        if isinstance(v, dict):
+            for k in self.required:
+                if k not in v:
+                    errors.append((path + (k,), "缺失"))
+            for k, node in self.props.items():
+                if k in v:
+                    node.validate(v[k], path + (k,), errors)
+        elif isinstance(v, list) and self.items is not None:
+            for i, x in enumerate(v):
+                self.items.validate(x, path + (i,), errors)
+
+
+class CompiledSchema:
+    def __init__(self, name: str, description: str, schema: dict):
+        self.name = name
+        self.schema = schema
+        self.tool = {"name": name, "description": description, "input_schema": schema}
+        self._root = _Node(schema)
+        self._defaults = {k: v["default"] for k, v in schema.get("properties", {}).items()
+                          if "default" in v}
+
+    def coerce(self, value):
+        return self._root.coerce(value)
+
+    def validate(self, value) -> list:
+        """返回 [(路径元组, 错误描述)]，空列表表示合法"""
+        errors = []
+        self._root.validate(value, (), errors)
+        return errors
+
+    def prune_point(self, path: tuple):
+        """错误所在的最深可删除位置（非必填字段或数组元素）；只能重新生成时返回 None"""
+        node, best = self._root, None
+        for i, key in enumerate(path):
+            if isinstance(key, int):
+                best, node = path[:i + 1], node.items
+            else:
+                if key not in node.required:
+                    best = path[:i + 1]
+                node = node.props.get(key)
+            if node is None:
+                break
+        return best
+
+    def subset(self, fields: list) -> "CompiledSchema":
+        """只含指定顶层字段（全部必填）的子 schema，用于只修复失效字段"""
+        props = self.schema.get("properties", {})
+        return CompiledSchema(self.name, self.tool["description"], {
+            "type": "object",
+            "properties": {k: props[k] for k in fields if k in props},
+            "required": [k for k in fields if k in props],
+        })
+
+    def has_default(self, field: str) -> bool:
+        return field in self._defaults
+
+    def default(self, field: str):
+        """返回副本：默认值会进入结果并被下游修改，不能共享 schema 自身的对象"""
+        return copy.deepcopy(self._defaults.get(field))
+
+
+def prune(value: dict, paths: list):
+    """删除若干位置；倒序处理，保证数组下标不因前面的删除而错位"""
+    for path in sorted(set(paths), reverse=True):
+        target = value
+        try:
+            for key in path[:-1]:
+                target = target[key]
+            del target[path[-1]]
+        except (KeyError, IndexError, TypeError):
+            pass
+
+
+def compile_schema(name: str, description: str, schema: dict) -> CompiledSchema:
+    return CompiledSchema(name, description, schema)
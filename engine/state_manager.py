@@ -4,8 +4,16 @@ Session State Manager — 叙事引擎状态枢纽
 其余模块只读
 """
 import copy
+import functools
+import logging
+import threading
 import time
 
+from .compaction import ColdStore, compact, empty_archive, is_closed
+from .momentum import AxisSeries
+
+log = logging.getLogger("narrative_engine.state_manager")
+
 
 DEFAULT_STATE = {
     # ── 六轴状态 ──────────────────────────────────────────
@@ -17,19 +25,22 @@ DEFAULT_STATE = {
         "info_veil": {"revealed": [], "hidden": ["origin_secret", "true_purpose"]},
         "energy":    60,   # 叙事能量 0-100
     },
-    # ── 动量 ─────────────────────────────────────────────
+    # ── 动量（本地计算，见 momentum.py）─────────────────────
     "momentum": {
         "pace":       "medium",   # slow / medium / fast
         "direction":  "stable",   # escalating / stable / de-escalating
         "streak":     0,          # 连续同向轮次数
+        "features":   {},         # 每轴 {value, smoothed, trend, volatility}
     },
     # ── 线程池 ───────────────────────────────────────────
     "threads": [],   # [{id, name, status, progress, hooks}]
     # ── NEH 事件池 ───────────────────────────────────────
     "event_pool": {
         "pending":   [],   # 待触发事件卡
-        "triggered": [],   # 已触发事件历史
+        "triggered": [],   # 最近已触发事件（更早的归档到冷存储）
     },
+    # ── 归档摘要（有界）────────────────────────────────────
+    "archive": empty_archive(),
     # ── 元数据 ───────────────────────────────────────────
     "meta": {
         "turn": 0,
@@ -39,24 +50,40 @@ DEFAULT_STATE = {
 }
 
 
+def _locked(method):
+    """主线程与后台 Predictor 会并发读写同一会话状态，写入口统一加锁"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class StateManager:
     def __init__(self):
         self._state = copy.deepcopy(DEFAULT_STATE)
         self._state["meta"]["created_at"] = time.time()
+        self._cold = ColdStore()
+        self._thread_index: dict[str, dict] = {}   # id -> 热状态中的线程对象
+        self._lock = threading.RLock()
+        self._series = AxisSeries()
+        self._series.record(self._state["axes"])
 
+    @_locked
     def get_state(self) -> dict:
         """只读快照"""
         return copy.deepcopy(self._state)
 
+    @_locked
     def apply_patch(self, patch: dict):
         """
         Director 专用写入口。
         patch 格式:
         {
           "axes": {...},          # 仅需包含要改变的字段
-          "momentum": {...},
           "threads_add": [...],
           "threads_update": [...],   # [{id, status, progress}]
+          "thread_focus": "...",     # 本轮重点线程（id 或名称），刷新其活跃轮次
           "patch_summary": "..."
         }
         """
@@ -68,20 +95,53 @@ class StateManager:
                 else:
                     self._state["axes"][k] = v
 
-        mom_patch = patch.get("momentum", {})
-        self._state["momentum"].update(mom_patch)
+        # 动量由轴值序列本地推导，忽略 patch 中的 momentum
+        self._series.record(self._state["axes"])
+        self._state["momentum"] = dict(self._series.momentum(), features=self._series.features())
 
+        turn = self._state["meta"]["turn"]
         for t in patch.get("threads_add", []):
+            t = dict(t)
+            t.setdefault("id", f"thread_{turn}_{len(self._thread_index)}")
+            t["last_active_turn"] = turn
             self._state["threads"].append(t)
+            self._thread_index[t["id"]] = t
 
-        updates = {u["id"]: u for u in patch.get("threads_update", [])}
-        for t in self._state["threads"]:
-            if t["id"] in updates:
-                t.update(updates[t["id"]])
+        for u in patch.get("threads_update", []):
+            t = self._thread_index.get(u.get("id"))
+            # 只关闭已归档线程的更新无需取回，否则会被本次 compact 重新归档
+            if t is None and not is_closed(u):
+                t = self._restore_thread(u.get("id"))
+            if t is not None:
+                t.update(u)
+                t["last_active_turn"] = turn
+
+        focus = patch.get("thread_focus")
+        if focus:
+            for t in self._state["threads"]:
+                if focus in (t.get("id"), t.get("name")):
+                    t["last_active_turn"] = turn
 
         self._state["meta"]["last_patch_summary"] = patch.get("patch_summary", "")
         self._state["meta"]["turn"] += 1
+        compact(self._state, self._cold, self._thread_index)
+
+    def _restore_thread(self, thread_id):
+        """threads_update 命中已归档线程时，把它取回热状态"""
+        t = self._cold.restore_thread(thread_id) if thread_id else None
+        if t is not None:
+            log.info("线程 %s 从归档恢复", thread_id)
+            self._state["threads"].append(t)
+            self._thread_index[thread_id] = t
+            self._state["archive"] = self._cold.snapshot()
+        return t
+
+    @_locked
+    def get_archive(self) -> dict:
+        """冷存储全量快照（调试用，不进入任何 prompt）"""
+        return copy.deepcopy({"threads": list(self._cold.threads.values()), "events": self._cold.events})
 
+    @_locked
     def update_event_pool(self, events: list):
         """NEH Predictor 写入新事件卡"""
         existing_ids = {e["id"] for e in self._state["event_pool"]["pending"]}
@@ -89,6 +149,7 @@ class StateManager:
             if ev["id"] not in existing_ids:
                 self._state["event_pool"]["pending"].append(ev)
 
+    @_locked
     def fire_event(self, event_id: str):
         """NEH Trigger 触发事件（不可逆）"""
         pending = self._state["event_pool"]["pending"]
@@ -97,5 +158,6 @@ class StateManager:
                 ev["fired_at_turn"] = self._state["meta"]["turn"]
                 self._state["event_pool"]["triggered"].append(ev)
                 pending.pop(i)
+                compact(self._state, self._cold, self._thread_index)
                 return ev
         return None
@@ -0,0 +1,84 @@
+"""
+单会话轮次队列 — 同一 session 的请求串行执行，进行中到达的消息合并为下一轮
+同一时刻每个会话只有一个 leader 线程在跑管道；其余请求挂起等待结果。
+本轮尚未写状态（commit 之前）时有新消息到达，则本轮被取代：
+取消令牌置位，上游 LLM 调用提前释放，消息并入下一轮一起处理。
+"""
+import threading
+
+MAX_SUPERSEDE = 2   # 单批最多被取代次数，防止连续输入导致永远无法出结果
+
+
+class Ticket:
+    """一条用户消息的等待凭据"""
+
+    def __init__(self, message: str):
+        self.message = message
+        self.result: dict | None = None
+        self._ready = threading.Event()
+
+    def wait(self) -> bool:
+        """阻塞直到轮到自己执行（返回 True）或结果已就绪（返回 False）"""
+        self._ready.wait()
+        return self.result is None
+
+
+class TurnQueue:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._inbox: list[Ticket] = []
+        self._running = False
+        self._committed = False
+        self.cancel = threading.Event()   # 本轮被取代时置位
+
+    def submit(self, message: str) -> Ticket:
+        ticket = Ticket(message)
+        with self._cond:
+            self._inbox.append(ticket)
+            if not self._running:
+                self._running = True
+                self._promote(ticket)
+            elif not self._committed:
+                self.cancel.set()
+        return ticket
+
+    def take_batch(self) -> list[Ticket]:
+        """leader 取走当前收件箱中全部消息，作为一轮处理"""
+        with self._cond:
+            batch, self._inbox = self._inbox, []
+            self._committed = False
+            self.cancel.clear()
+            return batch
+
+    def commit(self, force: bool = False) -> bool:
+        """
+        写状态前调用。若本轮已被新消息取代且未强制，返回 False（调用方应 requeue）；
+        否则标记已提交，之后到达的消息只排队等下一轮
+        """
+        with self._cond:
+            if self.cancel.is_set() and not force:
+                return False
+            self._committed = True
+            return True
+
+    def requeue(self, batch: list[Ticket]):
+        """被取代的批次放回收件箱头部，与新消息合并"""
+        with self._cond:
+            self._inbox = batch + self._inbox
+
+    def finish(self, batch: list[Ticket], result: dict):
+        """分发结果，并把 leader 身份交给下一批的第一条消息"""
+        with self._cond:
+            for t in batch:
+                t.result = result
+                t._ready.set()
+            self._committed = False
+            self.cancel.clear()
+            if self._inbox:
+                self._promote(self._inbox[0])
+            else:
+                self._running = False
+
+    @staticmethod
+    def _promote(ticket: Ticket):
+        ticket._ready.set()